@@ -8,19 +8,38 @@
 """
 
 from decimal import Decimal, ROUND_HALF_UP
+from functools import lru_cache
+
+import numpy as np
+from numpy.typing import ArrayLike
 
 
 # Константы налогов и комиссий
 NPD_TAX_RATE = Decimal("0.04")  # 4% НПД (налог для самозанятых)
 YUKASSA_COMMISSION_RATE = Decimal("0.028")  # 2.8% комиссия ЮKassa
 
+# Decimal-константы создаются один раз при импорте, а не на каждом вызове
+_CENT = Decimal("0.01")  # шаг округления — копейка
+_ZERO = Decimal("0.00")
+# Коэффициент вычетов (1 - 0.04 - 0.028 = 0.932)
+_DEDUCTION_COEFFICIENT = Decimal("1") - NPD_TAX_RATE - YUKASSA_COMMISSION_RATE
+
+
+def _as_decimal(amount) -> Decimal:
+    # float нельзя: Decimal(0.1) взял бы двоичное значение 0.1000000000000000055...
+    # (до кэширования float * Decimal и так падал с TypeError)
+    if isinstance(amount, float):
+        raise TypeError("amount must be Decimal, int or str, not float")
+    return Decimal(amount)
+
 
 def calculate_npd_tax(amount: Decimal) -> Decimal:
     """
     Расчёт налога для самозанятых (НПД) - 4%.
 
     Args:
-        amount: Сумма платежа в рублях
+        amount: Сумма платежа в рублях — Decimal, int или str ("1000");
+            float (включая 0.0) отклоняется с TypeError
 
     Returns:
         Decimal: Сумма налога (округлено до 2 знаков после запятой)
@@ -29,11 +48,21 @@ def calculate_npd_tax(amount: Decimal) -> Decimal:
         >>> calculate_npd_tax(Decimal("1000"))
         Decimal('40.00')
     """
+    return _npd_tax_cached(_as_decimal(amount))
+
+
+# Каталог тарифов небольшой и фиксированный — одни и те же суммы считаются
+# на каждом платеже, поэтому чистые расчёты кэшируются по Decimal-сумме
+# (1000 и Decimal("1000") попадают в один слот). Ключ кэша — только сумма:
+# активный decimal-контекст (точность, округление) не учитывается, и
+# результат, посчитанный в одном контексте, вернётся и в другом.
+@lru_cache(maxsize=128)
+def _npd_tax_cached(amount: Decimal) -> Decimal:
     if amount <= 0:
-        return Decimal("0.00")
+        return _ZERO
 
     tax = amount * NPD_TAX_RATE
-    return tax.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+    return tax.quantize(_CENT, rounding=ROUND_HALF_UP)
 
 
 def calculate_yukassa_commission(amount: Decimal) -> Decimal:
@@ -41,7 +70,8 @@ def calculate_yukassa_commission(amount: Decimal) -> Decimal:
     Расчёт комиссии ЮKassa - 2.8%.
 
     Args:
-        amount: Сумма платежа в рублях
+        amount: Сумма платежа в рублях — Decimal, int или str ("1000");
+            float (включая 0.0) отклоняется с TypeError
 
     Returns:
         Decimal: Сумма комиссии (округлено до 2 знаков после запятой)
@@ -50,11 +80,16 @@ def calculate_yukassa_commission(amount: Decimal) -> Decimal:
         >>> calculate_yukassa_commission(Decimal("1000"))
         Decimal('28.00')
     """
+    return _yukassa_commission_cached(_as_decimal(amount))
+
+
+@lru_cache(maxsize=128)
+def _yukassa_commission_cached(amount: Decimal) -> Decimal:
     if amount <= 0:
-        return Decimal("0.00")
+        return _ZERO
 
     commission = amount * YUKASSA_COMMISSION_RATE
-    return commission.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+    return commission.quantize(_CENT, rounding=ROUND_HALF_UP)
 
 
 def calculate_total_deductions(amount: Decimal) -> Decimal:
@@ -72,13 +107,13 @@ def calculate_total_deductions(amount: Decimal) -> Decimal:
         Decimal('68.00')  # 40 (НПД) + 28 (комиссия)
     """
     if amount <= 0:
-        return Decimal("0.00")
+        return _ZERO
 
     npd = calculate_npd_tax(amount)
     commission = calculate_yukassa_commission(amount)
     total = npd + commission
 
-    return total.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+    return total.quantize(_CENT, rounding=ROUND_HALF_UP)
 
 
 def calculate_net_amount(amount: Decimal) -> Decimal:
@@ -96,12 +131,12 @@ def calculate_net_amount(amount: Decimal) -> Decimal:
         Decimal('932.00')  # 1000 - 40 (НПД) - 28 (комиссия)
     """
     if amount <= 0:
-        return Decimal("0.00")
+        return _ZERO
 
     deductions = calculate_total_deductions(amount)
     net = amount - deductions
 
-    return net.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+    return net.quantize(_CENT, rounding=ROUND_HALF_UP)
 
 
 def calculate_gross_amount(net_amount: Decimal) -> Decimal:
@@ -121,13 +156,11 @@ def calculate_gross_amount(net_amount: Decimal) -> Decimal:
         Decimal('1000.00')
     """
     if net_amount <= 0:
-        return Decimal("0.00")
+        return _ZERO
 
-    # Коэффициент вычетов (1 - 0.04 - 0.028 = 0.932)
-    deduction_coefficient = Decimal("1") - NPD_TAX_RATE - YUKASSA_COMMISSION_RATE
-    gross = net_amount / deduction_coefficient
+    gross = net_amount / _DEDUCTION_COEFFICIENT
 
-    return gross.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+    return gross.quantize(_CENT, rounding=ROUND_HALF_UP)
 
 
 def format_tax_breakdown(amount: Decimal) -> dict:
@@ -135,7 +168,8 @@ def format_tax_breakdown(amount: Decimal) -> dict:
     Полная разбивка суммы на составляющие.
 
     Args:
-        amount: Сумма платежа в рублях
+        amount: Сумма платежа в рублях — Decimal, int или str ("1000");
+            float (включая 0.0) отклоняется с TypeError
 
     Returns:
         dict: Словарь с разбивкой:
@@ -157,14 +191,20 @@ def format_tax_breakdown(amount: Decimal) -> dict:
             'deduction_percentage': Decimal('6.80')
         }
     """
+    # Копия — кэшированный dict не должен меняться вызывающим кодом
+    return dict(_format_tax_breakdown_cached(_as_decimal(amount)))
+
+
+@lru_cache(maxsize=128)
+def _format_tax_breakdown_cached(amount: Decimal) -> dict:
     if amount <= 0:
         return {
-            "gross_amount": Decimal("0.00"),
-            "npd_tax": Decimal("0.00"),
-            "yukassa_commission": Decimal("0.00"),
-            "total_deductions": Decimal("0.00"),
-            "net_amount": Decimal("0.00"),
-            "deduction_percentage": Decimal("0.00"),
+            "gross_amount": _ZERO,
+            "npd_tax": _ZERO,
+            "yukassa_commission": _ZERO,
+            "total_deductions": _ZERO,
+            "net_amount": _ZERO,
+            "deduction_percentage": _ZERO,
         }
 
     npd = calculate_npd_tax(amount)
@@ -172,11 +212,57 @@ def format_tax_breakdown(amount: Decimal) -> dict:
     deductions = calculate_total_deductions(amount)
     net = calculate_net_amount(amount)
     deduction_pct = (deductions / amount * 100).quantize(
-        Decimal("0.01"), rounding=ROUND_HALF_UP
+        _CENT, rounding=ROUND_HALF_UP
     )
 
     return {
-        "gross_amount": amount.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP),
+        "gross_amount": amount.quantize(_CENT, rounding=ROUND_HALF_UP),
+        "npd_tax": npd,
+        "yukassa_commission": commission,
+        "total_deductions": deductions,
+        "net_amount": net,
+        "deduction_percentage": deduction_pct,
+    }
+
+
+def format_tax_breakdown_batch(amounts: ArrayLike) -> dict[str, np.ndarray]:
+    """
+    Векторная разбивка для пакета сумм (дашборды, ежедневная сверка).
+
+    Считает во float64 через numpy — на больших массивах на порядки быстрее
+    поштучного Decimal. Округление до копейки — половина вверх, как
+    ROUND_HALF_UP в format_tax_breakdown. Для расчётов по отдельному платежу
+    используйте format_tax_breakdown.
+
+    Args:
+        amounts: Суммы платежей в рублях (list / np.ndarray / любой ArrayLike)
+
+    Returns:
+        dict: Те же ключи, что у format_tax_breakdown, значения — np.ndarray (float64).
+              Для сумм <= 0 все значения равны 0.
+
+    Example:
+        >>> format_tax_breakdown_batch([1000, 399])["net_amount"]
+        array([932.  , 371.87])
+    """
+    def round_cents(values):
+        # np.round округляет «к чётному» — нужна половина вверх. Сначала
+        # срезаем шум float64 (33.75 * 0.028 * 100 = 94.4999...), затем floor(x + 0.5)
+        return np.floor(np.round(values * 100, 6) + 0.5) / 100
+
+    gross = round_cents(np.asarray(amounts, dtype=np.float64))
+    gross = np.where(gross > 0, gross, 0.0)
+
+    npd = round_cents(gross * float(NPD_TAX_RATE))
+    commission = round_cents(gross * float(YUKASSA_COMMISSION_RATE))
+    deductions = round_cents(npd + commission)
+    net = round_cents(gross - deductions)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        deduction_pct = np.where(gross > 0, round_cents(deductions / gross * 100), 0.0)
+
+    return {
+        "gross_amount": gross,
         "npd_tax": npd,
         "yukassa_commission": commission,
         "total_deductions": deductions,
@@ -326,15 +326,15 @@ def event_loop():
     loop.close()
 
 
-@pytest.fixture(scope="function")
-async def test_db():
+@pytest.fixture(scope="session")
+async def test_engine():
     """
-    Create a test database session for integration tests.
+    Create the test database engine for integration tests.
 
-    Creates all tables before test, yields session, drops tables after.
+    Creates all tables once per test session, drops them at the end.
     Requires PostgreSQL test database to be available.
     """
-    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+    from sqlalchemy.ext.asyncio import create_async_engine
     from sqlalchemy.pool import NullPool
     from app.db.base import Base
 
@@ -353,17 +353,7 @@ async def test_db():
         await engine.dispose()
         pytest.skip(f"PostgreSQL test DB unavailable: {exc}")
 
-    # Create session factory
-    TestSessionLocal = async_sessionmaker(
-        engine,
-        class_=AsyncSession,
-        expire_on_commit=False,
-    )
-
-    # Yield session for test
-    async with TestSessionLocal() as session:
-        yield session
-        await session.rollback()
+    yield engine
 
     # Drop all tables
     async with engine.begin() as conn:
@@ -373,6 +363,33 @@ async def test_db():
     await engine.dispose()
 
 
+@pytest.fixture(scope="function")
+async def test_db(test_engine):
+    """
+    Create a test database session for integration tests.
+
+    The session is bound to a connection with an open outer transaction;
+    session.commit() (fixtures, endpoints) only releases a SAVEPOINT, and
+    the outer transaction is rolled back after the test.
+    """
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+    async with test_engine.connect() as conn:
+        trans = await conn.begin()
+
+        # Yield session for test
+        session = AsyncSession(
+            bind=conn,
+            expire_on_commit=False,
+            join_transaction_mode="create_savepoint",
+        )
+        try:
+            yield session
+        finally:
+            await session.close()
+            await trans.rollback()
+
+
 @pytest.fixture(scope="function")
 async def test_client(test_db):
     """
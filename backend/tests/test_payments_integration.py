@@ -9,15 +9,292 @@ Integration тесты для Payments API endpoints (ЮKassa)
 2. Убедитесь, что PostgreSQL запущен
 """
 
+import orjson
 import pytest
-from httpx import AsyncClient
+from freezegun import freeze_time
+from httpx import ASGITransport, AsyncClient, Response
+from sqlalchemy import bindparam, select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
 from unittest.mock import AsyncMock, patch, Mock
 from datetime import datetime, timedelta, timezone
-import uuid
+from decimal import Decimal
+from types import MappingProxyType
+from typing import Optional
+import itertools
 
 from app.models.user import User, SubscriptionType
-from app.models.payment import Payment
+from app.models.payment import Payment, PaymentStatus, PaymentType
+from app.services.yukassa import YuKassaClient
+from app.utils.tax import calculate_net_amount
+
+
+# Уникальность id нужна только в пределах процесса — счётчик вместо uuid4
+_id = itertools.count()
+
+
+def _uid(prefix: str) -> str:
+    return f"{prefix}-{next(_id)}"
+
+
+def _next_tid() -> int:
+    return 100_000_000 + next(_id)
+
+
+# Поиск платежа по yookassa_id (payment_id — лишь property-алиас, по нему
+# фильтровать нельзя) — statement собирается один раз на модуль.
+# Грузим только колонки, которые проверяют тесты создания платежа
+# (обращение к незагруженному атрибуту в async-сессии упадёт — список
+# нужно дополнять вместе с assert'ами). subscription_type/credits_amount —
+# property поверх *_awarded, поэтому в load_only указываются сами колонки.
+_PAYMENT_BY_ID = (
+    select(Payment)
+    .where(Payment.yookassa_id == bindparam("pid"))
+    .options(
+        load_only(
+            Payment.user_id,
+            Payment.payment_type,
+            Payment.subscription_type_awarded,
+            Payment.credits_awarded,
+            Payment.amount,
+            Payment.status,
+            Payment.idempotency_key,
+        )
+    )
+)
+
+# Только начисляемые поля пользователя — без refresh() всей строки
+_USER_AWARD_STATE = select(User.subscription_ops_limit, User.balance_credits).where(
+    User.id == bindparam("uid")
+)
+
+
+async def _refresh_payment_and_user(session: AsyncSession, payment: Payment, user: User) -> None:
+    """Перечитать payment и user из БД одним SELECT вместо двух refresh()."""
+    stmt = (
+        select(Payment, User)
+        .where(Payment.id == payment.id, User.id == user.id)
+        .execution_options(populate_existing=True)
+    )
+    (await session.execute(stmt)).one()
+
+
+# Все тесты модуля идут при замороженном времени: проверки сроков подписки
+# не зависят от wall clock (в т.ч. при параллельном запуске)
+FROZEN_NOW = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture(autouse=True, scope="module")
+def frozen_time():
+    """Заморозить время на FROZEN_NOW (event loop asyncio остаётся на реальных часах)."""
+    with freeze_time(FROZEN_NOW, real_asyncio=True) as frozen:
+        yield frozen
+
+
+@pytest.fixture(autouse=True)
+def mock_yukassa_sig():
+    """
+    Подпись webhook ЮKassa считается валидной для всех тестов модуля.
+
+    Тест, которому нужна невалидная подпись, переопределяет
+    mock_yukassa_sig.return_value = False.
+    """
+    with patch.object(YuKassaClient, "verify_webhook_signature", return_value=True) as mock_verify:
+        yield mock_verify
+
+
+@pytest.fixture(scope="module")
+async def shared_client():
+    """Один AsyncClient (ASGITransport) на весь модуль."""
+    from app.main import app
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+@pytest.fixture
+async def test_client(shared_client: AsyncClient, test_db: AsyncSession):
+    """
+    Переопределяет conftest.test_client: клиент общий на модуль,
+    get_db подменяется на сессию текущего теста.
+    """
+    from app.main import app
+    from app.db.session import get_db
+
+    async def override_get_db():
+        yield test_db
+
+    app.dependency_overrides[get_db] = override_get_db
+    # authenticated_test_client выставляет заголовок на общий клиент —
+    # сбрасываем, чтобы токен не протекал между тестами
+    shared_client.headers.pop("Authorization", None)
+
+    yield shared_client
+
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def mock_payment_id(monkeypatch) -> str:
+    """
+    Подменяет YuKassaClient.create_payment обычной async-функцией
+    и возвращает id платежа, который она отдаёт.
+    """
+    payment_id = _uid("test-payment")
+
+    async def fake_create_payment(self, *args, **kwargs) -> dict:
+        return {
+            "id": payment_id,
+            "status": "pending",
+            "confirmation": {
+                "type": "redirect",
+                "confirmation_url": f"https://yookassa.ru/checkout/{payment_id}"
+            }
+        }
+
+    monkeypatch.setattr(YuKassaClient, "create_payment", fake_create_payment)
+    return payment_id
+
+
+@pytest.fixture
+async def fresh_user(test_db: AsyncSession) -> User:
+    """
+    Собственный пользователь теста (50 кредитов, без подписки).
+
+    Тесты модуля мутируют пользователя (подписка, баланс), поэтому каждый
+    получает свой экземпляр с уникальным telegram_id.
+    """
+    user = User(
+        telegram_id=_next_tid(),
+        username=_uid("payer"),
+        first_name="Test",
+        last_name="User",
+        balance_credits=50,
+        subscription_type=None,
+        freemium_actions_used=0,
+        freemium_reset_at=datetime.utcnow(),
+    )
+    test_db.add(user)
+    await test_db.flush()
+    return user
+
+
+@pytest.fixture
+async def authenticated_test_client(test_client: AsyncClient, fresh_user: User) -> AsyncClient:
+    """Переопределяет conftest.authenticated_test_client: JWT для fresh_user."""
+    from app.utils.jwt import create_access_token
+
+    token = create_access_token(
+        data={
+            "user_id": fresh_user.id,
+            "telegram_id": fresh_user.telegram_id
+        }
+    )
+
+    test_client.headers["Authorization"] = f"Bearer {token}"
+
+    return test_client
+
+
+# Webhook тела отправляются заранее сериализованными байтами (orjson)
+_encode = orjson.dumps
+_JSON_HEADERS = MappingProxyType({"Content-Type": "application/json"})
+
+
+def _json(response: Response):
+    """Разобрать JSON ответа через orjson прямо из байтов тела."""
+    return orjson.loads(response.content)
+
+
+# Шаблоны webhook payload ЮKassa (неизменяемые, копируются в _make_webhook)
+_WEBHOOK_BASE = MappingProxyType({"type": "notification"})
+_AMOUNT_BASE = MappingProxyType({"currency": "RUB"})
+
+
+def _make_webhook(
+    payment_id: str,
+    event: str,
+    amount: Optional[float] = None,
+    metadata: Optional[dict] = None,
+    paid: bool = True,
+) -> dict:
+    """Собрать webhook payload ЮKassa для платежа."""
+    obj = {"id": payment_id, "status": event.split(".", 1)[1]}
+    if amount is not None:
+        obj["amount"] = {**_AMOUNT_BASE, "value": f"{amount:.2f}"}
+        obj["metadata"] = metadata or {}
+        obj["paid"] = paid
+
+    return {**_WEBHOOK_BASE, "event": event, "object": obj}
+
+
+# Параметры pending-платежей для webhook тестов: (tariff_id для metadata, колонки Payment)
+_PENDING_PAYMENTS = {
+    "basic": ("basic", {
+        "payment_type": PaymentType.SUBSCRIPTION,
+        "subscription_type_awarded": "basic",
+        "amount": Decimal("399.00"),
+    }),
+    "standard": ("standard", {
+        "payment_type": PaymentType.SUBSCRIPTION,
+        "subscription_type_awarded": "standard",
+        "amount": Decimal("699.00"),
+    }),
+    "premium": ("premium", {
+        "payment_type": PaymentType.SUBSCRIPTION,
+        "subscription_type_awarded": "premium",
+        "amount": Decimal("1290.00"),
+    }),
+    "credits": ("large", {
+        "payment_type": PaymentType.CREDITS,
+        "credits_awarded": 100,
+        "amount": Decimal("799.00"),
+    }),
+}
+
+
+# Ожидаемая подписка после успешной оплаты: (тип, лимит действий)
+_EXPECTED_SUBSCRIPTION = {
+    "basic": (SubscriptionType.BASIC, 30),
+    "standard": (SubscriptionType.STANDARD, 60),
+    "premium": (SubscriptionType.PREMIUM, 120),
+}
+
+
+@pytest.fixture(params=list(_PENDING_PAYMENTS))
+async def pending_payment(request, test_db: AsyncSession, fresh_user: User):
+    """
+    Pending payment в БД и builder webhook payload для него.
+
+    Платёж создаётся внутри SAVEPOINT (без commit) — видим в той же сессии,
+    которую использует test_client, и откатывается вместе с тестом.
+    Тест может сузить набор параметров через indirect parametrize.
+    """
+    tariff_id, columns = _PENDING_PAYMENTS[request.param]
+    payment = Payment(
+        user_id=fresh_user.id,
+        yookassa_id=_uid(f"{request.param}-payment"),
+        status=PaymentStatus.PENDING,
+        idempotency_key=_uid("idem"),
+        created_at=datetime.utcnow(),
+        **columns,
+    )
+    payment.net_amount = calculate_net_amount(payment.amount)
+
+    async with test_db.begin_nested():
+        test_db.add(payment)
+    await test_db.refresh(payment)
+
+    def build_payload(event: str = "payment.succeeded", paid: bool = True) -> dict:
+        # Webhook handler начисляет по payment_type + tariff_id из metadata
+        metadata = {
+            "user_id": str(fresh_user.id),
+            "payment_type": payment.payment_type.value,
+            "tariff_id": tariff_id,
+        }
+        return _make_webhook(payment.yookassa_id, event, float(payment.amount), metadata, paid=paid)
+
+    return payment, build_payload
 
 
 @pytest.mark.asyncio
@@ -33,8 +310,9 @@ class TestSubscriptionPurchase:
     async def test_create_subscription_payment(
         self,
         authenticated_test_client: AsyncClient,
-        test_user_with_credits: User,
+        fresh_user: User,
         test_db: AsyncSession,
+        mock_payment_id: str,
         subscription_type: str,
         expected_price: float,
         expected_actions: int,
@@ -45,197 +323,31 @@ class TestSubscriptionPurchase:
         2. Вызвать YuKassa API
         3. Вернуть confirmation_url для оплаты
         """
-        # Mock YuKassa API
-        with patch("app.services.yukassa_client.YuKassaClient.create_payment") as mock_create:
-            mock_payment_id = f"test-payment-{uuid.uuid4()}"
-            mock_create.return_value = {
-                "id": mock_payment_id,
-                "status": "pending",
-                "confirmation": {
-                    "type": "redirect",
-                    "confirmation_url": f"https://yookassa.ru/checkout/{mock_payment_id}"
-                }
-            }
-
-            response = await authenticated_test_client.post(
-                "/api/v1/payments/create-subscription",
-                json={
-                    "subscription_type": subscription_type
-                }
-            )
-
-            assert response.status_code == 200
-            data = response.json()
-
-            assert "payment_id" in data
-            assert "confirmation_url" in data
-            assert data["confirmation_url"] == f"https://yookassa.ru/checkout/{mock_payment_id}"
-
-            # Verify payment saved in DB
-            from sqlalchemy import select
-            stmt = select(Payment).where(Payment.payment_id == mock_payment_id)
-            result = await test_db.execute(stmt)
-            payment = result.scalar_one_or_none()
-
-            assert payment is not None
-            assert payment.user_id == test_user_with_credits.id
-            assert payment.payment_type == "subscription"
-            assert payment.subscription_type == subscription_type
-            assert payment.amount == expected_price
-            assert payment.status == "pending"
-            assert payment.idempotency_key is not None
-
-    async def test_subscription_webhook_success(
-        self,
-        test_client: AsyncClient,
-        test_user_with_credits: User,
-        test_db: AsyncSession,
-    ):
-        """
-        Webhook от YuKassa при успешной оплате подписки должен:
-        1. Обновить статус payment на succeeded
-        2. Активировать подписку для пользователя
-        3. Начислить subscription_ops_limit
-        """
-        # Create pending payment
-        payment_id = f"test-payment-{uuid.uuid4()}"
-        idempotency_key = f"idem-{uuid.uuid4()}"
-
-        payment = Payment(
-            user_id=test_user_with_credits.id,
-            payment_id=payment_id,
-            payment_type="subscription",
-            subscription_type="premium",
-            amount=1290.0,
-            currency="RUB",
-            status="pending",
-            idempotency_key=idempotency_key,
-            created_at=datetime.utcnow(),
-        )
-
-        test_db.add(payment)
-        await test_db.commit()
-        await test_db.refresh(payment)
-
-        # Mock YuKassa webhook signature verification
-        with patch("app.services.yukassa_client.YuKassaClient.verify_webhook_signature") as mock_verify:
-            mock_verify.return_value = True
-
-            # Simulate webhook payload from YuKassa
-            webhook_payload = {
-                "type": "notification",
-                    "event": "payment.succeeded",
-                    "object": {
-                        "id": payment_id,
-                        "status": "succeeded",
-                        "amount": {
-                            "value": "1290.00",
-                            "currency": "RUB"
-                        },
-                        "metadata": {
-                            "user_id": str(test_user_with_credits.id),
-                            "subscription_type": "premium"
-                    },
-                    "paid": True,
-                    "created_at": datetime.utcnow().isoformat(),
-                }
+        response = await authenticated_test_client.post(
+            "/api/v1/payments/create-subscription",
+            json={
+                "subscription_type": subscription_type
             }
-
-            response = await test_client.post(
-                "/api/v1/payments/webhook",
-                json=webhook_payload,
-                headers={"X-Signature": "test-signature"}
-            )
-
-            assert response.status_code == 200
-
-            # Verify payment status updated
-            await test_db.refresh(payment)
-            assert payment.status == "succeeded"
-            assert payment.completed_at is not None
-
-            # Verify subscription activated for user
-            await test_db.refresh(test_user_with_credits)
-            assert test_user_with_credits.subscription_type == SubscriptionType.PREMIUM
-            assert test_user_with_credits.subscription_ops_limit == 120
-            assert test_user_with_credits.subscription_ops_used == 0
-            assert test_user_with_credits.subscription_end is not None
-            # Subscription should be valid for 30 days
-            assert test_user_with_credits.subscription_end > datetime.now(timezone.utc)
-
-    async def test_idempotent_webhook_processing(
-        self,
-        test_client: AsyncClient,
-        test_user_with_credits: User,
-        test_db: AsyncSession,
-    ):
-        """
-        Повторная обработка того же webhook не должна начислить кредиты дважды
-        (идемпотентность через idempotency_key)
-        """
-        payment_id = f"test-payment-{uuid.uuid4()}"
-        idempotency_key = f"idem-{uuid.uuid4()}"
-
-        payment = Payment(
-            user_id=test_user_with_credits.id,
-            payment_id=payment_id,
-            payment_type="subscription",
-            subscription_type="basic",
-            amount=399.0,
-            currency="RUB",
-            status="pending",
-            idempotency_key=idempotency_key,
-            created_at=datetime.utcnow(),
         )
 
-        test_db.add(payment)
-        await test_db.commit()
-        await test_db.refresh(payment)
-
-        webhook_payload = {
-            "type": "notification",
-            "event": "payment.succeeded",
-            "object": {
-                "id": payment_id,
-                "status": "succeeded",
-                "amount": {"value": "399.00", "currency": "RUB"},
-                "metadata": {
-                    "user_id": str(test_user_with_credits.id),
-                    "subscription_type": "basic"
-                },
-                "paid": True,
-            }
-        }
-
-        with patch("app.services.yukassa_client.YuKassaClient.verify_webhook_signature") as mock_verify:
-            mock_verify.return_value = True
-
-            # First webhook - should process
-            response1 = await test_client.post(
-                "/api/v1/payments/webhook",
-                json=webhook_payload,
-                headers={"X-Signature": "test-sig"}
-            )
-
-            assert response1.status_code == 200
-
-            await test_db.refresh(test_user_with_credits)
-            first_limit = test_user_with_credits.subscription_ops_limit
-
-            # Second webhook (duplicate) - should NOT process again
-            response2 = await test_client.post(
-                "/api/v1/payments/webhook",
-                json=webhook_payload,
-                headers={"X-Signature": "test-sig"}
-            )
+        assert response.status_code == 200
+        data = _json(response)
 
-            assert response2.status_code == 200
+        assert "payment_id" in data
+        assert "confirmation_url" in data
+        assert data["confirmation_url"] == f"https://yookassa.ru/checkout/{mock_payment_id}"
 
-            await test_db.refresh(test_user_with_credits)
-            second_limit = test_user_with_credits.subscription_ops_limit
+        # Verify payment saved in DB
+        result = await test_db.execute(_PAYMENT_BY_ID, {"pid": mock_payment_id})
+        payment = result.scalar_one_or_none()
 
-            # Actions should be the same (not doubled)
-            assert first_limit == second_limit
+        assert payment is not None
+        assert payment.user_id == fresh_user.id
+        assert payment.payment_type == "subscription"
+        assert payment.subscription_type == subscription_type
+        assert payment.amount == expected_price
+        assert payment.status == "pending"
+        assert payment.idempotency_key is not None
 
 
 @pytest.mark.asyncio
@@ -246,106 +358,63 @@ class TestCreditsPurchase:
     async def test_create_credits_payment(
         self,
         authenticated_test_client: AsyncClient,
-        test_user_with_credits: User,
+        fresh_user: User,
         test_db: AsyncSession,
+        mock_payment_id: str,
     ):
         """
         Покупка кредитов должна создать pending payment
         """
-        with patch("app.services.yukassa_client.YuKassaClient.create_payment") as mock_create:
-            mock_payment_id = f"credits-{uuid.uuid4()}"
-            mock_create.return_value = {
-                "id": mock_payment_id,
-                "status": "pending",
-                "confirmation": {
-                    "type": "redirect",
-                    "confirmation_url": f"https://yookassa.ru/checkout/{mock_payment_id}"
-                }
+        response = await authenticated_test_client.post(
+            "/api/v1/payments/create-credits",
+            json={
+                "credits_amount": 100
             }
+        )
 
-            response = await authenticated_test_client.post(
-                "/api/v1/payments/create-credits",
-                json={
-                    "credits_amount": 100
-                }
-            )
-
-            assert response.status_code == 200
-            data = response.json()
+        assert response.status_code == 200
+        data = _json(response)
 
-            assert "payment_id" in data
-            assert "confirmation_url" in data
+        assert "payment_id" in data
+        assert "confirmation_url" in data
 
-            # Verify payment in DB
-            from sqlalchemy import select
-            stmt = select(Payment).where(Payment.payment_id == mock_payment_id)
-            result = await test_db.execute(stmt)
-            payment = result.scalar_one_or_none()
+        # Verify payment in DB
+        result = await test_db.execute(_PAYMENT_BY_ID, {"pid": mock_payment_id})
+        payment = result.scalar_one_or_none()
 
-            assert payment is not None
-            assert payment.payment_type == "credits"
-            assert payment.credits_amount == 100
-            assert payment.amount == 799.0  # Price for 100 credits
+        assert payment is not None
+        assert payment.payment_type == "credits"
+        assert payment.credits_amount == 100
+        assert payment.amount == 799.0  # Price for 100 credits
 
+    @pytest.mark.parametrize("pending_payment", ["credits"], indirect=True)
     async def test_credits_webhook_success(
         self,
         test_client: AsyncClient,
-        test_user_with_credits: User,
+        fresh_user: User,
         test_db: AsyncSession,
+        pending_payment,
     ):
         """
         Webhook при успешной покупке кредитов должен начислить кредиты
         """
-        payment_id = f"credits-payment-{uuid.uuid4()}"
-        idempotency_key = f"idem-{uuid.uuid4()}"
-
-        payment = Payment(
-            user_id=test_user_with_credits.id,
-            payment_id=payment_id,
-            payment_type="credits",
-            credits_amount=100,
-            amount=799.0,
-            currency="RUB",
-            status="pending",
-            idempotency_key=idempotency_key,
-            created_at=datetime.utcnow(),
-        )
+        _, build_payload = pending_payment
 
-        test_db.add(payment)
-        await test_db.commit()
-        await test_db.refresh(payment)
-
-        initial_credits = test_user_with_credits.balance_credits
-
-        webhook_payload = {
-            "type": "notification",
-            "event": "payment.succeeded",
-            "object": {
-                "id": payment_id,
-                "status": "succeeded",
-                "amount": {"value": "799.00", "currency": "RUB"},
-                "metadata": {
-                    "user_id": str(test_user_with_credits.id),
-                    "credits_amount": "100"
-                },
-                "paid": True,
-            }
-        }
+        initial_credits = fresh_user.balance_credits
 
-        with patch("app.services.yukassa_client.YuKassaClient.verify_webhook_signature") as mock_verify:
-            mock_verify.return_value = True
+        webhook_body = _encode(build_payload())
 
-            response = await test_client.post(
-                "/api/v1/payments/webhook",
-                json=webhook_payload,
-                headers={"X-Signature": "test-sig"}
-            )
+        response = await test_client.post(
+            "/api/v1/payments/webhook",
+            content=webhook_body,
+            headers={**_JSON_HEADERS, "X-YooKassa-Signature": "test-sig"}
+        )
 
-            assert response.status_code == 200
+        assert response.status_code == 200
 
-            # Verify credits added
-            await test_db.refresh(test_user_with_credits)
-            assert test_user_with_credits.balance_credits == initial_credits + 100
+        # Verify credits added
+        await test_db.refresh(fresh_user)
+        assert fresh_user.balance_credits == initial_credits + 100
 
     async def test_invalid_credits_amount(
         self,
@@ -372,36 +441,35 @@ class TestPaymentHistory:
     async def test_get_user_payment_history(
         self,
         authenticated_test_client: AsyncClient,
-        test_user_with_credits: User,
+        fresh_user: User,
         test_db: AsyncSession,
     ):
         """
         Получение истории платежей пользователя
         """
-        # Create several payments
+        # Create several payments (Core multi-row INSERT, без identity map)
+        rows = []
         for i in range(3):
-            payment = Payment(
-                user_id=test_user_with_credits.id,
-                payment_id=f"payment-{i}",
-                payment_type="credits" if i % 2 == 0 else "subscription",
-                credits_amount=100 if i % 2 == 0 else None,
-                subscription_type=None if i % 2 == 0 else "basic",
-                amount=799.0 if i % 2 == 0 else 399.0,
-                currency="RUB",
-                status="succeeded",
-                idempotency_key=f"idem-{i}",
-                created_at=datetime.utcnow() - timedelta(days=i),
-                completed_at=datetime.utcnow() - timedelta(days=i),
-            )
-            test_db.add(payment)
-
-        await test_db.commit()
+            amount = Decimal("799.00") if i % 2 == 0 else Decimal("399.00")
+            rows.append({
+                "user_id": fresh_user.id,
+                "yookassa_id": f"payment-{i}",
+                "payment_type": PaymentType.CREDITS if i % 2 == 0 else PaymentType.SUBSCRIPTION,
+                "credits_awarded": 100 if i % 2 == 0 else None,
+                "subscription_type_awarded": None if i % 2 == 0 else "basic",
+                "amount": amount,
+                "net_amount": calculate_net_amount(amount),
+                "status": PaymentStatus.SUCCEEDED,
+                "idempotency_key": f"idem-{i}",
+                "created_at": datetime.utcnow() - timedelta(days=i),
+            })
+        await test_db.execute(Payment.__table__.insert(), rows)
 
         # Get payment history
         response = await authenticated_test_client.get("/api/v1/payments/history")
 
         assert response.status_code == 200
-        history = response.json()
+        history = _json(response)
 
         assert len(history) >= 3
 
@@ -416,49 +484,46 @@ class TestPaymentHistory:
     async def test_cannot_see_other_users_payments(
         self,
         authenticated_test_client: AsyncClient,
-        test_user_with_credits: User,
+        fresh_user: User,
         test_db: AsyncSession,
     ):
         """
         Пользователь не должен видеть платежи других пользователей
         """
-        # Create another user with payment
-        from app.models.user import User
-
-        other_user = User(
-            telegram_id=999888777,
-            username="other_payer",
-            first_name="Other",
-            last_name="Payer",
-            balance_credits=0,
-            subscription_type=None,
+        # Create another user with payment (Core INSERT, без ORM)
+        other_user_id = await test_db.scalar(
+            User.__table__.insert()
+            .values(
+                telegram_id=_next_tid(),
+                username="other_payer",
+                first_name="Other",
+                last_name="Payer",
+                balance_credits=0,
+                subscription_type=None,
+            )
+            .returning(User.__table__.c.id)
         )
 
-        test_db.add(other_user)
-        await test_db.commit()
-        await test_db.refresh(other_user)
-
-        # Create payment for other user
-        other_payment = Payment(
-            user_id=other_user.id,
-            payment_id="other-payment-123",
-            payment_type="credits",
-            credits_amount=100,
-            amount=799.0,
-            currency="RUB",
-            status="succeeded",
-            idempotency_key="other-idem",
-            created_at=datetime.utcnow(),
+        await test_db.execute(
+            Payment.__table__.insert(),
+            [{
+                "user_id": other_user_id,
+                "yookassa_id": "other-payment-123",
+                "payment_type": PaymentType.CREDITS,
+                "credits_awarded": 100,
+                "amount": Decimal("799.00"),
+                "net_amount": calculate_net_amount(Decimal("799.00")),
+                "status": PaymentStatus.SUCCEEDED,
+                "idempotency_key": "other-idem",
+                "created_at": datetime.utcnow(),
+            }],
         )
 
-        test_db.add(other_payment)
-        await test_db.commit()
-
-        # Get payment history as test_user_with_credits
+        # Get payment history as fresh_user
         response = await authenticated_test_client.get("/api/v1/payments/history")
 
         assert response.status_code == 200
-        history = response.json()
+        history = _json(response)
 
         # Should not contain other user's payment
         payment_ids = [p["payment_id"] for p in history]
@@ -470,87 +535,27 @@ class TestPaymentHistory:
 class TestWebhookSecurity:
     """Тесты безопасности webhook"""
 
-    async def test_webhook_rejects_invalid_signature(
-        self,
-        test_client: AsyncClient,
-        test_user_with_credits: User,
-        test_db: AsyncSession,
-    ):
-        """
-        Webhook с невалидной подписью должен быть отклонён
-        """
-        payment_id = f"test-payment-{uuid.uuid4()}"
-
-        payment = Payment(
-            user_id=test_user_with_credits.id,
-            payment_id=payment_id,
-            payment_type="credits",
-            credits_amount=100,
-            amount=799.0,
-            currency="RUB",
-            status="pending",
-            idempotency_key=f"idem-{uuid.uuid4()}",
-            created_at=datetime.utcnow(),
-        )
-
-        test_db.add(payment)
-        await test_db.commit()
-
-        webhook_payload = {
-            "type": "notification",
-            "event": "payment.succeeded",
-            "object": {
-                "id": payment_id,
-                "status": "succeeded",
-                "amount": {"value": "799.00", "currency": "RUB"},
-                "metadata": {
-                    "user_id": str(test_user_with_credits.id),
-                    "credits_amount": "100"
-                },
-                "paid": True,
-            }
-        }
-
-        # Mock invalid signature
-        with patch("app.services.yukassa_client.YuKassaClient.verify_webhook_signature") as mock_verify:
-            mock_verify.return_value = False  # Invalid signature
-
-            response = await test_client.post(
-                "/api/v1/payments/webhook",
-                json=webhook_payload,
-                headers={"X-Signature": "invalid-signature"}
-            )
-
-            # Should reject
-            assert response.status_code in [401, 403]
-
-            # Payment should still be pending
-            await test_db.refresh(payment)
-            assert payment.status == "pending"
-
     async def test_webhook_without_signature_header(
         self,
         test_client: AsyncClient,
     ):
         """
-        Webhook без заголовка X-Signature должен быть отклонён
+        Webhook без заголовка X-YooKassa-Signature должен быть отклонён.
+
+        Эндпоинт всегда отвечает 200 (чтобы ЮKassa не повторял webhook):
+        отказ по подписи перехватывается и возвращается как {"status": "error"}.
         """
-        webhook_payload = {
-            "type": "notification",
-            "event": "payment.succeeded",
-            "object": {
-                "id": "some-payment-id",
-                "status": "succeeded",
-            }
-        }
+        webhook_payload = _make_webhook("some-payment-id", "payment.succeeded")
 
-        # No X-Signature header
+        # No X-YooKassa-Signature header
         response = await test_client.post(
             "/api/v1/payments/webhook",
-            json=webhook_payload
+            content=_encode(webhook_payload),
+            headers=_JSON_HEADERS,
         )
 
-        assert response.status_code in [400, 401, 403]
+        assert response.status_code == 200
+        assert _json(response)["status"] == "error"
 
 
 @pytest.mark.asyncio
@@ -570,7 +575,7 @@ class TestSubscriptionExpiration:
 
         # Create user with expired subscription
         user_expired = User(
-            telegram_id=555666777,
+            telegram_id=_next_tid(),
             username="expired_sub_user",
             first_name="Expired",
             last_name="Sub",
@@ -578,11 +583,11 @@ class TestSubscriptionExpiration:
             subscription_type=SubscriptionType.PREMIUM,
             subscription_ops_limit=120,
             subscription_ops_used=0,
-            subscription_end=datetime.now(timezone.utc) - timedelta(days=1),  # Expired
+            subscription_end=FROZEN_NOW - timedelta(days=1),  # Expired
         )
 
         test_db.add(user_expired)
-        await test_db.commit()
+        await test_db.flush()
         await test_db.refresh(user_expired)
 
         # В реальном приложении была бы background task, которая проверяет
@@ -598,14 +603,15 @@ class TestSubscriptionExpiration:
             }
         )
 
-        test_client.headers["Authorization"] = f"Bearer {token}"
-
         # При попытке использовать API, должна произойти проверка подписки
         # и она должна быть деактивирована
-        response = await test_client.get("/api/v1/auth/me")
+        response = await test_client.get(
+            "/api/v1/auth/me",
+            headers={"Authorization": f"Bearer {token}"},
+        )
 
         assert response.status_code == 200
-        user_data = response.json()
+        user_data = _json(response)
 
         # В зависимости от реализации, subscription_type может быть сброшен
         # или actions_left = 0
@@ -614,66 +620,105 @@ class TestSubscriptionExpiration:
 
 @pytest.mark.asyncio
 @pytest.mark.integration
-class TestPaymentCancellation:
-    """Тесты отмены платежа"""
-
-    async def test_payment_cancellation_webhook(
+class TestWebhookScenarios:
+    """Сценарии обработки webhook ЮKassa (успех / дубль / отмена / невалидная подпись)"""
+
+    # Начисление проверяется для каждого тарифа; дубль, отмена и невалидная
+    # подпись от тарифа не зависят — им хватает одного вида платежа
+    @pytest.mark.parametrize(
+        "pending_payment,event,sig_valid,expected_result,expected_payment_status,duplicate",
+        [
+            *(
+                pytest.param(kind, "payment.succeeded", True, "ok", "succeeded", False,
+                             id=f"success-{kind}")
+                for kind in _PENDING_PAYMENTS
+            ),
+            pytest.param("credits", "payment.succeeded", True, "ok", "succeeded", True, id="duplicate"),
+            pytest.param("basic", "payment.canceled", True, "ok", "cancelled", False, id="canceled"),
+            pytest.param("basic", "payment.succeeded", False, "error", "pending", False, id="bad-signature"),
+        ],
+        indirect=["pending_payment"],
+    )
+    async def test_webhook_scenario(
         self,
         test_client: AsyncClient,
-        test_user_with_credits: User,
+        fresh_user: User,
         test_db: AsyncSession,
+        pending_payment,
+        mock_yukassa_sig: Mock,
+        event: str,
+        sig_valid: bool,
+        expected_result: str,
+        expected_payment_status: str,
+        duplicate: bool,
     ):
         """
-        Webhook о отмене платежа должен обновить статус на canceled
+        Webhook должен:
+        - при успешной оплате перевести payment в succeeded и начислить
+          подписку/кредиты, причём повторный webhook не начисляет второй раз
+          (идемпотентность через idempotency_key)
+        - при отмене перевести payment в cancelled без начислений
+        - с невалидной подписью быть отклонён, payment остаётся pending
+
+        Ответ всегда 200 (чтобы ЮKassa не повторял webhook) — результат
+        обработки виден только по полю status в теле ответа.
         """
-        payment_id = f"canceled-payment-{uuid.uuid4()}"
-
-        payment = Payment(
-            user_id=test_user_with_credits.id,
-            payment_id=payment_id,
-            payment_type="subscription",
-            subscription_type="premium",
-            amount=1290.0,
-            currency="RUB",
-            status="pending",
-            idempotency_key=f"idem-{uuid.uuid4()}",
-            created_at=datetime.utcnow(),
-        )
+        payment, build_payload = pending_payment
+        initial_credits = fresh_user.balance_credits
+        mock_yukassa_sig.return_value = sig_valid
 
-        test_db.add(payment)
-        await test_db.commit()
-        await test_db.refresh(payment)
-
-        webhook_payload = {
-            "type": "notification",
-            "event": "payment.canceled",
-            "object": {
-                "id": payment_id,
-                "status": "canceled",
-                "amount": {"value": "1290.00", "currency": "RUB"},
-                "metadata": {
-                    "user_id": str(test_user_with_credits.id),
-                    "subscription_type": "premium"
-                },
-                "paid": False,
-            }
-        }
+        # Тело сериализуется один раз и переиспользуется для повторного webhook
+        webhook_body = _encode(build_payload(event=event, paid=event == "payment.succeeded"))
 
-        with patch("app.services.yukassa_client.YuKassaClient.verify_webhook_signature") as mock_verify:
-            mock_verify.return_value = True
+        response = await test_client.post(
+            "/api/v1/payments/webhook",
+            content=webhook_body,
+            headers={**_JSON_HEADERS, "X-YooKassa-Signature": "test-sig"}
+        )
+        assert response.status_code == 200
+        assert _json(response)["status"] == expected_result
 
+        if duplicate:
+            first_state = (
+                await test_db.execute(_USER_AWARD_STATE, {"uid": fresh_user.id})
+            ).one()
+
+            # Second webhook (duplicate) - should NOT process again
             response = await test_client.post(
                 "/api/v1/payments/webhook",
-                json=webhook_payload,
-                headers={"X-Signature": "test-sig"}
+                content=webhook_body,
+                headers={**_JSON_HEADERS, "X-YooKassa-Signature": "test-sig"}
             )
-
             assert response.status_code == 200
 
-            # Verify payment status updated
-            await test_db.refresh(payment)
-            assert payment.status == "canceled"
-
-            # User should NOT have subscription activated
-            await test_db.refresh(test_user_with_credits)
-            assert test_user_with_credits.subscription_type is None
+        # Verify payment status updated
+        await _refresh_payment_and_user(test_db, payment, fresh_user)
+        assert payment.status == expected_payment_status
+
+        if duplicate:
+            second_state = (
+                await test_db.execute(_USER_AWARD_STATE, {"uid": fresh_user.id})
+            ).one()
+            # Actions/credits should be the same (not doubled)
+            assert second_state == first_state
+
+        if expected_payment_status != "succeeded":
+            # Nothing should be awarded
+            assert fresh_user.subscription_type is None
+            assert fresh_user.balance_credits == initial_credits
+            return
+
+        assert payment.completed_at is not None
+
+        if payment.payment_type == "credits":
+            assert fresh_user.balance_credits == initial_credits + payment.credits_amount
+            return
+
+        # Verify subscription activated for user
+        expected_type, expected_ops_limit = _EXPECTED_SUBSCRIPTION[payment.subscription_type]
+        assert fresh_user.subscription_type == expected_type
+        assert fresh_user.subscription_ops_limit == expected_ops_limit
+        assert fresh_user.subscription_ops_used == 0
+        assert fresh_user.subscription_end is not None
+        # Subscription should be valid for 30 days
+        assert fresh_user.subscription_end > FROZEN_NOW
@@ -15,6 +15,7 @@ from app.utils.tax import (
     calculate_net_amount,
     calculate_gross_amount,
     format_tax_breakdown,
+    format_tax_breakdown_batch,
 )
 
 
@@ -46,6 +47,11 @@ class TestCalculateNPDTax:
 
         assert result == Decimal("0.00")
 
+    def test_npd_tax_rejects_float(self):
+        """float не принимается — только Decimal/int/str"""
+        with pytest.raises(TypeError):
+            calculate_npd_tax(0.1)
+
 
 class TestCalculateYuKassaCommission:
     """Тесты расчёта комиссии ЮKassa (2.8%)"""
@@ -172,6 +178,35 @@ class TestFormatTaxBreakdown:
         assert "net_amount" in result
         assert result["net_amount"] == Decimal("932.00")
 
+    def test_format_tax_breakdown_returns_copy(self):
+        """Изменение возвращённого dict не портит кэш для следующих вызовов"""
+        result = format_tax_breakdown(Decimal("1000"))
+        result["net_amount"] = Decimal("0")
+        result.pop("npd_tax")
+
+        again = format_tax_breakdown(Decimal("1000"))
+
+        assert again["net_amount"] == Decimal("932.00")
+        assert again["npd_tax"] == Decimal("40.00")
+
+    def test_format_tax_breakdown_same_for_int_str_decimal(self):
+        """1000, "1000" и Decimal("1000") дают одинаковый результат"""
+        expected = format_tax_breakdown(Decimal("1000"))
+
+        assert format_tax_breakdown(1000) == expected
+        assert format_tax_breakdown("1000") == expected
+        assert calculate_npd_tax(1000) == calculate_npd_tax("1000") == Decimal("40.00")
+        assert (
+            calculate_yukassa_commission(1000)
+            == calculate_yukassa_commission("1000")
+            == Decimal("28.00")
+        )
+
+    def test_format_tax_breakdown_rejects_float_zero(self):
+        """float отклоняется даже для нулевой суммы"""
+        with pytest.raises(TypeError):
+            format_tax_breakdown(0.0)
+
     def test_format_tax_breakdown_keys(self):
         """Проверка всех ключей в разбивке"""
         result = format_tax_breakdown(Decimal("500"))
@@ -257,3 +292,36 @@ class TestRealWorldScenarios:
 
         assert profit_percentage > Decimal("93")
         assert profit_percentage < Decimal("94")
+
+
+class TestFormatTaxBreakdownBatch:
+    """Тесты векторной разбивки (numpy) для отчётов"""
+
+    def test_batch_matches_decimal_for_project_tariffs(self):
+        """Float-путь совпадает с Decimal на тарифах проекта"""
+        tariffs = [399, 699, 1290, 199]
+
+        batch = format_tax_breakdown_batch(tariffs)
+
+        for i, amount in enumerate(tariffs):
+            expected = format_tax_breakdown(Decimal(amount))
+            for key, value in expected.items():
+                assert batch[key][i] == float(value), key
+
+    def test_batch_rounds_half_kopek_up(self):
+        """Половина копейки округляется вверх, как ROUND_HALF_UP"""
+        # 33.75 * 2.8% = 0.945 → 0.95 (np.round дал бы 0.94)
+        batch = format_tax_breakdown_batch([33.75])
+        expected = format_tax_breakdown(Decimal("33.75"))
+
+        assert batch["yukassa_commission"][0] == 0.95
+        assert batch["deduction_percentage"][0] == 6.81
+        for key, value in expected.items():
+            assert batch[key][0] == float(value), key
+
+    def test_batch_non_positive_amounts(self):
+        """Нулевые и отрицательные суммы дают нулевую разбивку"""
+        batch = format_tax_breakdown_batch([0, -100])
+
+        for values in batch.values():
+            assert values.tolist() == [0.0, 0.0]